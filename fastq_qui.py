@@ -1,11 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from collections import defaultdict
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import threading
+import queue
+import subprocess
+import shutil
+import gzip
+import mmap
 import os
 
+try:
+    import rapidgzip
+    _HAS_RAPIDGZIP = True
+except ImportError:  # Необязательная зависимость: без неё работает стандартный gzip
+    rapidgzip = None
+    _HAS_RAPIDGZIP = False
+
 # Фисташковая цветовая схема
 PISTACHIO_THEME = {
     'primary': '#93C572',      # Основной фисташковый
@@ -19,124 +33,996 @@ PISTACHIO_THEME = {
     'warning': '#FFD700',       # Жёлтое предупреждение
 }
 
+# Количество ридов в одной пачке, которую обрабатывает рабочий поток
+BATCH_SIZE = 8192
+
+# Размер распакованного блока, который фоновый поток кладёт в очередь
+GZIP_BUFSIZE = 1 << 22
+
+# Окно mmap, в котором за один векторный проход ищутся переводы строк
+MMAP_WINDOW = 1 << 24
+
+# Число различимых оценок качества Phred+33 ('!'..'~')
+QUALITY_SCORES = 94
+
+# Столбцы гистограммы оснований: A, C, G, T и все остальные символы
+BASE_COLUMNS = 5
+
+# Несжатые файлы от этого размера разбираются по частям в нескольких процессах
+PARALLEL_SCAN_BYTES = 1 << 30
+
+# Сжатые FASTQ: распаковываются потоком (см. _open_bytes)
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+# Сколько первых записей должны совпасть длинами строк, чтобы разбирать файл с шагом
+FIXED_PROBE_RECORDS = 10
+FIXED_PROBE_BYTES = 1 << 16
+
+# Начальная ёмкость накопителей по позициям; при нехватке она удваивается
+INITIAL_MAX_LEN = 1024
+
+# Начальная ёмкость массива длин ридов; растёт так же, удвоением
+INITIAL_LENGTHS = 1 << 16
+
+# Не больше стольких маркеров на линии графика: у длинных ридов (ONT) тысячи позиций
+PLOT_MAX_MARKERS = 200
+
+# Настройки matplotlib для длинных линий: упрощение путей и отрисовка кусками
+PLOT_RC = {
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,
+}
+
+# Файл-индекс рядом с FASTQ: результаты полного прохода между запусками
+INDEX_SUFFIX = '.fqidx.npz'
+INDEX_VERSION = 1
+
+# Основания в порядке столбцов гистограммы; последний столбец - всё остальное (N и т.п.)
+_BASES = 'ACGT'
+
+# Таблица байт -> столбец гистограммы оснований. Строчные буквы отображаются
+# в те же столбцы, что и прописные, так что регистр не требует отдельного прохода
+_BASE_LUT = np.full(256, BASE_COLUMNS - 1, dtype=np.uint8)
+_BASE_LUT[list(_BASES.encode())] = _BASE_LUT[list(_BASES.lower().encode())] = np.arange(len(_BASES))
+
+
+def _scan_hist_loops(data, seq_starts, seq_ends, qual_starts, qual_ends, qual_out, base_out, len_out):
+    """Один проход по ридам пачки: гистограммы качества, оснований и длин сразу (компилирует numba)"""
+    for i in range(seq_starts.size):
+        seq_start = seq_starts[i]
+        length = seq_ends[i] - seq_start
+        len_out[length] += 1
+        for pos in range(length):
+            base_out[pos, _BASE_LUT[data[seq_start + pos]]] += 1
+        qual_start = qual_starts[i]
+        for pos in range(qual_ends[i] - qual_start):
+            score = data[qual_start + pos] - 33
+            if 0 <= score < qual_out.shape[1]:
+                qual_out[pos, score] += 1
+
+
+def _gather_lines(data, starts, ends):
+    """Копирует байты строк пачки и возвращает их вместе с позициями внутри строк"""
+    lengths = ends - starts
+    if lengths.min() == lengths.max():
+        # Строки одной длины: сразу матрица (строки x позиции)
+        positions = np.arange(lengths[0])
+        return data[starts[:, None] + positions], positions
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return data[np.repeat(starts, lengths) + positions], positions
+
+
+def _quality_hist(data, starts, ends, out):
+    """NumPy-версия ядра: гистограмма позиция x оценка для всей пачки сразу"""
+    n_scores = out.shape[1]
+    values, positions = _gather_lines(data, starts, ends)
+    scores = values.astype(np.intp)
+    scores -= 33  # Phred+33 -> оценка
+    
+    keys = scores + positions * n_scores
+    valid = (scores >= 0) & (scores < n_scores)
+    out += np.bincount(keys[valid], minlength=out.size).reshape(out.shape)
+
+
+def _base_hist(data, starts, ends, out):
+    """NumPy-версия ядра: гистограмма позиция x основание для всей пачки сразу"""
+    n_columns = out.shape[1]
+    values, positions = _gather_lines(data, starts, ends)
+    # Ключ позиция x основание - как номер ячейки out: один bincount вместо np.add.at
+    keys = _BASE_LUT[values].astype(np.intp)
+    keys += positions * n_columns
+    out += np.bincount(keys.ravel(), minlength=out.size).reshape(out.shape)
+
+
+def _scan_hist_numpy(data, seq_starts, seq_ends, qual_starts, qual_ends, qual_out, base_out, len_out):
+    """NumPy-версия: три гистограммы пачки векторными операциями по очереди"""
+    _quality_hist(data, qual_starts, qual_ends, qual_out)
+    _base_hist(data, seq_starts, seq_ends, base_out)
+    len_out += np.bincount(seq_ends - seq_starts, minlength=len_out.size)
+
+
+# Ядро прохода, выбранное _scan_kernel при первом вызове
+_scan_hist = None
+
+
+def _scan_kernel():
+    """
+    Ядро прохода: _scan_hist_loops, скомпилированное numba, а без неё - NumPy-версия.
+    numba импортируется здесь, а не при загрузке модуля: ядро вызывают процессы
+    пула, а процессу окна Tk её импорт и компиляция сигнатур не нужны.
+    """
+    global _scan_hist
+    if _scan_hist is None:
+        try:
+            from numba import njit, types
+        except ImportError:  # Без numba используются NumPy-версии ядер
+            _scan_hist = _scan_hist_numpy
+        else:
+            # Явные сигнатуры: ядро компилируется сразу (или берётся из кэша) под C-непрерывные
+            # массивы - данные пачки (из mmap они только для чтения), int64-границы строк
+            # и int64-гистограммы; так LLVM может векторизовать внутренние циклы
+            bounds = types.int64[::1]
+            hist = types.int64[:, ::1]
+            signatures = [types.void(data, bounds, bounds, bounds, bounds, hist, hist, bounds)
+                          for data in (types.Array(types.uint8, 1, 'C', readonly=True), types.uint8[::1])]
+            _scan_hist = njit(signatures, cache=True, nogil=True, fastmath=True,
+                              boundscheck=False)(_scan_hist_loops)
+    return _scan_hist
+
+
+# Общий для процессов пула счётчик обработанных байт файла (задаётся в _init_worker)
+_scan_progress = None
+
+
+def _init_worker(progress):
+    """Инициализатор процессов пула: запоминает счётчик прогресса и прогревает ядра"""
+    global _scan_progress
+    _scan_progress = progress
+    _warmup_kernels()
+
+
+def _advance_progress(nbytes):
+    """Добавляет nbytes к счётчику обработанных байт, если он задан"""
+    if _scan_progress is not None and nbytes:
+        with _scan_progress.get_lock():
+            _scan_progress.value += nbytes
+
+
+def _warmup_kernels():
+    """Прогоняет ядро на крошечных данных, чтобы его загрузка не задерживала первый анализ"""
+    data = np.frombuffer(b'AI', dtype=np.uint8)
+    # Одна запись: последовательность 'A' в [0, 1), качество 'I' в [1, 2)
+    seq_starts, seq_ends, qual_starts, qual_ends = (np.array([i], dtype=np.int64) for i in (0, 1, 1, 2))
+    qual_hist = np.zeros((1, QUALITY_SCORES), dtype=np.int64)
+    base_hist = np.zeros((1, BASE_COLUMNS), dtype=np.int64)
+    _scan_kernel()(data, seq_starts, seq_ends, qual_starts, qual_ends,
+                   qual_hist, base_hist, np.zeros(2, dtype=np.int64))
+
+
+def _is_compressed(path):
+    """Сжатый ли FASTQ (.gz или .zst) - такие читаются потоком, а не через mmap"""
+    return path.endswith(COMPRESSED_SUFFIXES)
+
+
+class _PipeDecompressor:
+    """
+    Распаковка внешней программой (pigz, zstd) в отдельном процессе:
+    сжатый файл подаётся ей на stdin, распакованные байты читаются из stdout
+    """
+    
+    def __init__(self, command, path):
+        self._command = command
+        self._file = open(path, 'rb')
+        try:
+            self._process = subprocess.Popen(command, stdin=self._file, stdout=subprocess.PIPE,
+                                             bufsize=GZIP_BUFSIZE)
+        except BaseException:
+            self._file.close()
+            raise
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def read(self, size=-1):
+        chunk = self._process.stdout.read(size)
+        if not chunk and self._process.wait() != 0:
+            raise OSError(f"{self._command[0]} завершился с кодом {self._process.returncode}")
+        return chunk
+    
+    def compressed_position(self):
+        """Сколько байт сжатого файла прочитал распаковщик"""
+        # Дескриптор stdin процесса разделяет смещение с нашим файлом
+        return os.lseek(self._file.fileno(), 0, os.SEEK_CUR)
+    
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+        self._file.close()
+
+
+def _open_bytes(path):
+    """
+    Распакованный бинарный поток сжатого FASTQ. .zst распаковывает zstd,
+    .gz - rapidgzip, если он установлен, иначе pigz в отдельном процессе,
+    а без него - стандартный gzip
+    """
+    if path.endswith('.zst'):
+        return _PipeDecompressor(['zstd', '-dcq', '-T0'], path)
+    if _HAS_RAPIDGZIP:
+        return rapidgzip.open(path, parallelization=os.cpu_count() or 1)
+    if shutil.which('pigz'):
+        return _PipeDecompressor(['pigz', '-dc'], path)
+    return gzip.open(path, 'rb')
+
+
+def _compressed_position(file):
+    """Смещение в сжатом файле, до которого дошла распаковка"""
+    if hasattr(file, 'tell_compressed'):  # rapidgzip считает смещение в битах
+        return file.tell_compressed() // 8
+    if isinstance(file, _PipeDecompressor):
+        return file.compressed_position()
+    return file.fileobj.tell()
+
+
+def _gz_reader_thread(path, out_queue, stop, bufsize=GZIP_BUFSIZE):
+    """
+    Фоновый поток: кладёт в очередь пары (распакованный блок до bufsize байт,
+    смещение в сжатом файле), в конце - None
+    """
+    def put(item):
+        # Не блокируемся навсегда, если читатель уже закрыл поток
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    try:
+        with _open_bytes(path) as file:
+            while True:
+                chunk = file.read(bufsize)
+                if not chunk:
+                    break
+                if not put((chunk, _compressed_position(file))):
+                    return
+    except Exception as e:  # Ошибку распаковки получит читатель
+        put(e)
+        return
+    put(None)
+
+
+class _GzipStream:
+    """
+    Распакованные блоки сжатого FASTQ (.gz, .zst) по одному через next_chunk: распаковка идёт
+    в отдельном потоке, а сюда готовые блоки приходят через очередь на два элемента
+    """
+    
+    def __init__(self, path, bufsize=GZIP_BUFSIZE):
+        self._queue = queue.Queue(maxsize=2)
+        self._stop = threading.Event()
+        self._finished = False
+        self.compressed_position = 0
+        threading.Thread(target=_gz_reader_thread,
+                         args=(path, self._queue, self._stop, bufsize),
+                         daemon=True).start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def next_chunk(self):
+        """Возвращает следующий распакованный блок или b'' в конце файла"""
+        if self._finished:
+            return b''
+        item = self._queue.get()
+        if item is None or isinstance(item, Exception):
+            self._finished = True
+            if item is not None:
+                raise item
+            return b''
+        chunk, self.compressed_position = item
+        return chunk
+    
+    def close(self):
+        self._stop.set()
+
+
+def _open_zero_copy(path):
+    """
+    Источник данных без лишних копий: mmap для обычного файла,
+    поток распакованных блоков для сжатого
+    """
+    if _is_compressed(path):
+        return _GzipStream(path)
+    if os.path.getsize(path) == 0:
+        return b''  # Пустой файл отобразить в память нельзя
+    with open(path, 'rb') as file:
+        # mmap закроется сам, когда будут освобождены все ссылающиеся на него пачки
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _split_records(data, final):
+    """
+    Находит полные записи FASTQ в буфере одним векторным поиском переводов строк.
+
+    Возвращает границы строк последовательностей и качеств (начала и концы,
+    np.int64), число разобранных байт и признак конца данных (пустой заголовок).
+    В последнем буфере (final) незавершённая запись дополняется пустыми строками.
+    """
+    newlines = np.flatnonzero(data == 10)
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_ends = np.append(newlines, data.size)
+    
+    n_lines = len(newlines)
+    if final and line_starts[-1] < data.size:
+        n_lines += 1  # Последняя строка без \n
+    if final and n_lines % 4:
+        padding = 4 - n_lines % 4
+        line_starts = np.append(line_starts[:n_lines], [data.size] * padding)
+        line_ends = np.append(line_ends[:n_lines], [data.size] * padding)
+        n_lines += padding
+    n_records = n_lines // 4
+    starts = line_starts[:4 * n_records]
+    ends = line_ends[:4 * n_records]
+    ends = ends - ((ends > starts) & (data[ends - 1] == 13))  # Убираем \r
+    
+    finished = False
+    empty_headers = np.flatnonzero(ends[0::4] == starts[0::4])
+    if empty_headers.size:  # Пустая строка - конец данных
+        n_records = empty_headers[0]
+        finished = True
+    
+    consumed = data.size if final else line_starts[4 * n_records]
+    records = tuple(np.ascontiguousarray(bounds[line::4][:n_records])
+                    for line, bounds in ((1, starts), (1, ends), (3, starts), (3, ends)))
+    return records, consumed, finished
+
+
+def _fixed_layout(data):
+    """
+    Раскладка записи, если первые FIXED_PROBE_RECORDS записей буфера совпадают
+    длинами всех четырёх строк (типично для Illumina), иначе None.
+    
+    Возвращает шаг записи, границы последовательности и качества внутри записи
+    и то, что проверяется в каждой записи: смещения и ожидаемые байты,
+    а также смещения последних байтов строк, где не должно быть \r.
+    """
+    newlines = np.flatnonzero(data[:FIXED_PROBE_BYTES] == 10)[:4 * FIXED_PROBE_RECORDS]
+    if len(newlines) < 4 * FIXED_PROBE_RECORDS:
+        return None
+    record_starts = np.concatenate(([0], newlines[3::4] + 1))
+    strides = np.diff(record_starts)
+    offsets = newlines.reshape(-1, 4) - record_starts[:-1, None]
+    if (strides != strides[0]).any() or (offsets != offsets[0]).any():
+        return None
+    
+    header_end, seq_end, plus_end, qual_end = offsets[0].tolist()
+    check_offsets = [0, header_end, seq_end, seq_end + 1, plus_end, qual_end]
+    check_values = [ord('@'), 10, 10, ord('+'), 10, 10]
+    # Окончания строк \r\n или \n - по первой записи, остальные должны совпасть
+    has_cr = seq_end > header_end + 1 and data[seq_end - 1] == 13
+    if has_cr:
+        seq_end -= 1
+        qual_end -= 1
+        check_offsets += [seq_end, qual_end]
+        check_values += [13, 13]
+    seq_bounds = (header_end + 1, seq_end)
+    qual_bounds = (plus_end + 1, qual_end)
+    cr_free = [end - 1 for start, end in (seq_bounds, qual_bounds) if end > start]
+    return (int(strides[0]), seq_bounds, qual_bounds,
+            np.array(check_offsets), np.array(check_values), np.array(cr_free, dtype=np.intp))
+
+
+def _split_fixed(data, layout):
+    """
+    Разбирает полные записи буфера с постоянным шагом, не ища переводы строк.
+    
+    В каждой записи проверяются только разделители и концы строк; если хоть
+    одна запись не совпала с раскладкой, возвращает None (нужен общий разбор).
+    """
+    stride, seq_bounds, qual_bounds, check_offsets, check_values, cr_free = layout
+    record_starts = np.arange(data.size // stride, dtype=np.int64) * stride
+    if ((data[record_starts[:, None] + check_offsets] != check_values).any()
+            or (data[record_starts[:, None] + cr_free] == 13).any()):
+        return None
+    records = tuple(record_starts + offset for offset in (*seq_bounds, *qual_bounds))
+    return records, len(record_starts) * stride
+
+
+def _split_buffer(data, final, layout):
+    """
+    Как _split_records, но при известной раскладке (_fixed_layout) полные
+    записи режутся с постоянным шагом, а общий разбор нужен только для хвоста
+    последнего буфера
+    """
+    fixed = _split_fixed(data, layout) if layout is not None else None
+    if fixed is None:
+        return _split_records(data, final)
+    records, consumed = fixed
+    if not final:
+        return records, consumed, False
+    rest, _, finished = _split_records(data[consumed:], True)
+    records = tuple(np.concatenate((head, tail + consumed)) for head, tail in zip(records, rest))
+    return records, data.size, finished
+
+
+def _batches(data, records, batch_size):
+    """Генератор: режет найденные записи буфера на пачки по batch_size"""
+    for i in range(0, len(records[0]), batch_size):
+        yield (data,) + tuple(bounds[i:i + batch_size] for bounds in records)
+
+
+def _parse_in_batches(path, batch_size=BATCH_SIZE, start=0, end=None):
+    """
+    Генератор пачек ридов: (данные, начала и концы последовательностей, начала и концы качеств).
+
+    Байты не декодируются в str: строки FASTQ - это ASCII, пачка обрабатывается как uint8.
+    Построчного чтения нет: файл берётся окнами mmap или блоками распаковки,
+    а строки размечаются одним векторным поиском переводов строк.
+    Записи не копируются: для обычного файла данные пачки - срезы mmap, поэтому
+    отдельный итератор по записям поверх memoryview не нужен.
+
+    Данные - массив uint8 поверх mmap или распакованного блока сжатого файла без копирования,
+    границы строк - массивы np.int64. Несжатый файл можно разобрать только в диапазоне
+    байт [start, end), начинающемся с начала записи. Возвращает (через StopIteration)
+    True, если разбор остановила пустая строка заголовка - конец данных.
+    """
+    source = _open_zero_copy(path)
+    if isinstance(source, _GzipStream):
+        with source:
+            tail = b''
+            reported = 0
+            chunk = source.next_chunk()
+            layout = _fixed_layout(np.frombuffer(chunk, dtype=np.uint8))
+            while True:
+                final = not chunk
+                data = np.frombuffer(tail + chunk if tail else chunk, dtype=np.uint8)
+                records, consumed, finished = _split_buffer(data, final, layout)
+                yield from _batches(data, records, batch_size)
+                # Для сжатого файла прогресс считаем по смещению в нём самом
+                _advance_progress(source.compressed_position - reported)
+                reported = source.compressed_position
+                if final or finished:
+                    return finished
+                tail = data[consumed:].tobytes()
+                chunk = source.next_chunk()
+    
+    data = np.frombuffer(source, dtype=np.uint8)[start:end]
+    layout = _fixed_layout(data)
+    pos = 0
+    window = MMAP_WINDOW
+    while pos < data.size:
+        end = min(pos + window, data.size)
+        block = data[pos:end]
+        records, consumed, finished = _split_buffer(block, end == data.size, layout)
+        if consumed == 0 and not finished:
+            window *= 2  # Запись не поместилась в окно
+            continue
+        yield from _batches(block, records, batch_size)
+        if finished:
+            return True
+        _advance_progress(consumed)
+        pos += consumed
+        window = MMAP_WINDOW
+    return False
+
+
+def _fit_rows(hist, rows):
+    """Накопитель хотя бы на rows позиций: при нехватке ёмкость удваивается"""
+    if rows <= len(hist):
+        return hist
+    capacity = max(len(hist), 1)
+    while capacity < rows:
+        capacity *= 2
+    grown = np.zeros((capacity,) + hist.shape[1:], dtype=hist.dtype)
+    grown[:len(hist)] = hist
+    return grown
+
+
+def _reduce_batches(batches, worker, combine, initial, max_workers=None):
+    """
+    Раздаёт пачки ридов пулу потоков и сворачивает частичные результаты.
+    
+    Одновременно в работе не больше двух пачек на поток, чтобы не читать
+    весь файл наперёд.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    result = initial
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in batches:
+            pending.append(executor.submit(worker, batch))
+            if len(pending) >= 2 * max_workers:
+                result = combine(result, pending.popleft().result())
+        while pending:
+            result = combine(result, pending.popleft().result())
+    return result
+
+
+_SCAN_HISTS = ('qual_hist', 'base_hist', 'len_hist')
+
+
+def _new_hists():
+    """Пустые гистограммы качества, оснований и длин с запасом на INITIAL_MAX_LEN позиций"""
+    return {
+        'qual_hist': np.zeros((INITIAL_MAX_LEN, QUALITY_SCORES), dtype=np.int64),
+        'base_hist': np.zeros((INITIAL_MAX_LEN, BASE_COLUMNS), dtype=np.int64),
+        'len_hist': np.zeros(INITIAL_MAX_LEN + 1, dtype=np.int64),
+        'rows': dict.fromkeys(_SCAN_HISTS, 0),  # Сколько позиций реально занято
+    }
+
+
+def _add_hists(acc, hists):
+    """Прибавляет гистограммы hists к накопителям acc на месте"""
+    for key in _SCAN_HISTS:
+        rows = hists['rows'][key]
+        acc[key] = _fit_rows(acc[key], rows)
+        acc[key][:rows] += hists[key][:rows]
+        acc['rows'][key] = max(acc['rows'][key], rows)
+
+
+def _batch_scan(batch, hists, skip_quality=False):
+    """
+    Прибавляет пачку к гистограммам hists одним ядром прямо на месте.
+    Возвращает количество ридов, их суммарную длину и длины ридов.
+    """
+    data, seq_starts, seq_ends, qual_starts, qual_ends = batch
+    if skip_quality:
+        # Пустые интервалы качества: ядро не трогает байты строк качества
+        qual_ends = qual_starts
+    lengths = seq_ends - seq_starts
+    max_length = int(lengths.max())
+    needed = (int((qual_ends - qual_starts).max()), max_length, max_length + 1)
+    for key, rows in zip(_SCAN_HISTS, needed):
+        hists[key] = _fit_rows(hists[key], rows)
+        hists['rows'][key] = max(hists['rows'][key], rows)
+    _scan_kernel()(data, seq_starts, seq_ends, qual_starts, qual_ends,
+                   hists['qual_hist'], hists['base_hist'], hists['len_hist'])
+    return len(lengths), int(lengths.sum()), lengths
+
+
+def _merge_scans(acc, part):
+    """Прибавляет счётчики пачки к итогам прохода (гистограммы копятся в потоках)"""
+    count, total_length, lengths = part
+    if 'lengths' in acc:
+        # Длины копятся в int32-массиве с удвоением ёмкости, а не в списке Python-чисел
+        start = acc['count']
+        acc['lengths'] = _fit_rows(acc['lengths'], start + count)
+        acc['lengths'][start:start + count] = lengths
+    acc['count'] += count
+    acc['total_length'] += total_length
+    return acc
+
+
+def _scan_batches(batches, skip_quality=False, keep_lengths=False, max_workers=None):
+    """Сворачивает пачки ридов в результат полного прохода (см. _full_scan)"""
+    # У каждого потока пула свои гистограммы: ядро пишет в них на месте,
+    # без выделения памяти на пачку и без блокировок
+    local = threading.local()
+    thread_hists = []
+    
+    def scan_batch(batch):
+        if not hasattr(local, 'hists'):
+            local.hists = _new_hists()
+            thread_hists.append(local.hists)
+        return _batch_scan(batch, local.hists, skip_quality)
+    
+    acc = {'count': 0, 'total_length': 0}
+    if keep_lengths:
+        acc['lengths'] = np.empty(INITIAL_LENGTHS, dtype=np.int32)
+    acc = _reduce_batches(batches, scan_batch, _merge_scans, acc, max_workers)
+    if keep_lengths:
+        acc['lengths'] = acc['lengths'][:acc['count']]
+    
+    hists = _new_hists()
+    for part in thread_hists:
+        _add_hists(hists, part)
+    # Отрезаем неиспользованный запас ёмкости
+    for key in _SCAN_HISTS:
+        acc[key] = hists[key][:hists['rows'][key]]
+    return acc
+
+
+def _next_record_start(data, pos):
+    """
+    Начало первой записи после pos в mmap: строка на '@', через одну строку
+    после которой идёт строка на '+' (строка качества тоже может начинаться с '@').
+    Возвращает -1, если записей дальше нет.
+    """
+    while True:
+        start = data.find(b'\n@', pos) + 1
+        if start == 0:
+            return -1
+        header_end = data.find(b'\n', start)
+        seq_end = data.find(b'\n', header_end + 1) if header_end >= 0 else -1
+        if seq_end >= 0 and data[seq_end + 1:seq_end + 2] == b'+':
+            return start
+        pos = start
+
+
+def _record_ranges(path, parts):
+    """Делит несжатый файл на не больше чем parts диапазонов байт, каждый - с начала записи"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    if size == 0:
+        return [(0, 0)]
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for i in range(1, parts):
+            start = _next_record_start(data, max(size * i // parts, bounds[-1]))
+            if start < 0:
+                break
+            if start > bounds[-1]:
+                bounds.append(start)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _scan_range(path, start, end, skip_quality=False, keep_lengths=False):
+    """
+    Полный проход по байтам [start, end) несжатого файла - задача для пула процессов.
+    Возвращает результат и признак того, что в диапазоне встретился конец данных.
+    """
+    finished = []
+    
+    def batches():
+        finished.append((yield from _parse_in_batches(path, start=start, end=end)))
+    
+    # Параллельность здесь - между процессами, поэтому внутри один поток ядер
+    scan = _scan_batches(batches(), skip_quality, keep_lengths, max_workers=1)
+    return scan, finished[0]
+
+
+def _parallel_scan(path, parts, skip_quality=False, keep_lengths=False):
+    """
+    Полный проход по частям файла в пуле процессов: и разбор, и ядра идут вне GIL.
+    Части сворачиваются по порядку; после части, где кончились данные, остальные не нужны.
+    """
+    acc = {'count': 0, 'total_length': 0}
+    lengths = []
+    hists = _new_hists()
+    
+    ranges = _record_ranges(path, parts)
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(_scan_progress,)) as executor:
+        futures = [executor.submit(_scan_range, path, start, end, skip_quality, keep_lengths)
+                   for start, end in ranges]
+        for future in futures:
+            scan, finished = future.result()
+            acc['count'] += scan['count']
+            acc['total_length'] += scan['total_length']
+            if keep_lengths:
+                lengths.append(scan['lengths'])
+            scan['rows'] = {key: len(scan[key]) for key in _SCAN_HISTS}
+            _add_hists(hists, scan)
+            if finished:
+                for rest in futures:
+                    rest.cancel()
+                break
+    
+    for key in _SCAN_HISTS:
+        acc[key] = hists[key][:hists['rows'][key]]
+    if keep_lengths:
+        acc['lengths'] = np.concatenate(lengths)
+    return acc
+
+
+def _full_scan(path, skip_quality=False, keep_lengths=False):
+    """
+    Один проход по файлу, собирающий всё для статистики и графиков:
+    количество ридов, их суммарную длину и гистограммы качества, оснований и длин.
+    С skip_quality=True строки качества не разбираются, а гистограмма качества пуста.
+    С keep_lengths=True в 'lengths' добавляется int32-массив длин всех ридов по порядку.
+    Большие несжатые файлы разбираются по частям в нескольких процессах.
+    """
+    workers = os.cpu_count() or 1
+    if (workers > 1 and not _is_compressed(path)
+            and os.path.getsize(path) >= PARALLEL_SCAN_BYTES):
+        return _parallel_scan(path, workers, skip_quality, keep_lengths)
+    return _scan_batches(_parse_in_batches(path), skip_quality, keep_lengths)
+
+
+def _file_key(path):
+    """Размер и время изменения файла: по ним проверяется свежесть индекса"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _load_index(path):
+    """Результат полного прохода из индекса рядом с файлом или None, если индекс устарел"""
+    try:
+        with np.load(path + INDEX_SUFFIX) as index:
+            if (int(index['version']) != INDEX_VERSION
+                    or (int(index['size']), int(index['mtime'])) != _file_key(path)):
+                return None
+            return {
+                'count': int(index['count']),
+                'total_length': int(index['total_length']),
+                'qual_hist': index['qual_hist'],
+                'base_hist': index['base_hist'],
+                'len_hist': index['len_hist'],
+            }
+    except Exception:
+        # Нет индекса, он повреждён или файл недоступен: просто считаем заново
+        return None
+
+
+def _save_index(path, scan, key):
+    """Атомарно записывает индекс: во временный файл, затем os.replace"""
+    index_path = path + INDEX_SUFFIX
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    size, mtime = key
+    try:
+        with open(tmp_path, 'wb') as file:
+            np.savez_compressed(file, version=INDEX_VERSION, size=size, mtime=mtime, **scan)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        # Каталог только для чтения и т.п.: индекс лишь ускоряет повторный запуск
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _indexed_scan(path):
+    """Полный проход с сохранением индекса для следующих запусков"""
+    key = _file_key(path)
+    scan = _full_scan(path)
+    _save_index(path, scan, key)
+    return scan
+
+
+def _quality_sums(quality_hist):
+    """Суммы оценок и число оценок по позициям из гистограммы позиция x оценка"""
+    return quality_hist @ np.arange(QUALITY_SCORES), quality_hist.sum(axis=1)
+
+
+# Номера позиций 1, 2, ... для графиков: один общий массив, отдаются его срезы
+_positions_cache = np.arange(1, INITIAL_MAX_LEN + 1, dtype=np.int32)
+_positions_cache.flags.writeable = False
+
+
+def _positions(n):
+    """Номера позиций 1..n (int32, только для чтения); общий массив растёт удвоением"""
+    global _positions_cache
+    if n > len(_positions_cache):
+        capacity = len(_positions_cache)
+        while capacity < n:
+            capacity *= 2
+        grown = np.arange(1, capacity + 1, dtype=np.int32)
+        grown.flags.writeable = False
+        _positions_cache = grown
+    return _positions_cache[:n]
+
+
+def _quality_from_sums(quality_sums, quality_counts):
+    """Позиции и средние оценки качества по суммам и числу оценок на позицию"""
+    positions = _positions(len(quality_sums))
+    avg_qualities = (quality_sums / np.maximum(quality_counts, 1)).tolist()
+    return positions, avg_qualities
+
+
+def _quality_from_hist(quality_hist):
+    """Позиции и средние оценки качества по гистограмме позиция x оценка"""
+    return _quality_from_sums(*_quality_sums(quality_hist))
+
+
+def _content_from_hist(base_hist):
+    """Позиции и проценты A, C, G, T по гистограмме позиция x основание"""
+    n_bases = len(_BASES)
+    total_counts = base_hist[:, :n_bases].sum(axis=1)
+    # Отбрасываем хвостовые позиции, где нет ни одного A, C, G или T
+    covered = np.flatnonzero(total_counts)
+    max_position = covered[-1] + 1 if covered.size else 0
+    
+    # Одно векторное деление на все позиции и основания сразу (строка на основание);
+    # где оснований нет, деление пропускается и остаётся ноль
+    counts = base_hist[:max_position, :n_bases].T
+    totals = total_counts[:max_position]
+    percentages = np.zeros(counts.shape)
+    np.divide(counts * 100.0, totals, out=percentages, where=totals > 0)
+    positions = _positions(max_position)
+    content_data = dict(zip(_BASES, percentages))
+    return positions, content_data
+
+
 class FastqReader:
     """
     FASTQ ридер для анализа файлов формата FASTQ
+    
+    Файл всегда читается в бинарном режиме: FASTQ - это ASCII, поэтому строки
+    не проходят через декодер UTF-8, а оценки качества - это сами байты минус 33.
     """
     
-    def __init__(self, filename):
+    def __init__(self, filename, skip_quality=False):
         self.filename = filename
+        # Быстрый режим: строки качества пропускаются, графика качества нет
+        self.skip_quality = skip_quality
         self._sequence_count = None
         self._total_length = None
         self._quality_data = None
         self._length_data = None
         self._content_data = None
+        self._all_collected = False
     
-    def _read_fastq_chunks(self):
-        """Генератор: читает FASTQ файл по одному риду за раз"""
-        with open(self.filename, 'r', encoding='utf-8') as file:
-            while True:
-                lines = [file.readline().strip() for _ in range(4)]
-                if not lines[0]:  # Конец файла
-                    break
-                yield lines
+    def _collect_all(self, skip_quality=False):
+        """Один проход по файлу: заполняет сразу все кэши (без качества при skip_quality)"""
+        scan = _full_scan(self.filename, skip_quality, keep_lengths=True)
+        self._sequence_count = scan['count']
+        self._total_length = scan['total_length']
+        self._length_data = scan.pop('lengths')
+        self._content_data = _content_from_hist(scan['base_hist'])
+        if not skip_quality:
+            self._quality_data = _quality_from_hist(scan['qual_hist'])
+        self._all_collected = True
+        return scan
+    
+    def _ensure_collected(self):
+        """Запускает общий проход, если его ещё не было"""
+        if not self._all_collected:
+            self._collect_all(self.skip_quality)
     
     def calculate_statistics(self):
-        """Рассчитывает статистику используя генератор"""
-        count = 0
-        total_length = 0
-        
-        for chunk in self._read_fastq_chunks():
-            count += 1
-            sequence_line = chunk[1]  # Вторая строка - последовательность
-            total_length += len(sequence_line)
-        
-        self._sequence_count = count
-        self._total_length = total_length
-        return count, total_length
+        """Рассчитывает статистику (общим проходом, если он ещё не выполнен)"""
+        self._ensure_collected()
+        return self._sequence_count, self._total_length
+    
+    def basic_stats(self):
+        """Возвращает количество последовательностей и их суммарную длину (один проход)"""
+        return self.calculate_statistics()
+    
+    def scan_all(self):
+        """Один проход по файлу: заполняет статистику и данные всех графиков"""
+        return self._collect_all(self.skip_quality)
+    
+    def scan_lengths_and_bases_only(self):
+        """Один проход без разбора строк качества: статистика, длины и содержание нуклеотидов"""
+        return self._collect_all(skip_quality=True)
     
     def get_sequence_count(self):
         """Возвращает количество последовательностей"""
-        if self._sequence_count is None:
-            self.calculate_statistics()
+        self._ensure_collected()
         return self._sequence_count
     
     def get_average_length(self):
         """Возвращает среднюю длину последовательностей"""
-        if self._sequence_count is None:
-            self.calculate_statistics()
+        self._ensure_collected()
         if self._sequence_count == 0:
             return 0
         return self._total_length / self._sequence_count
     
     def collect_quality_data(self):
         """Собирает данные для графика качества"""
-        if self._quality_data is not None:
-            return self._quality_data
-            
-        quality_sums = defaultdict(int)
-        quality_counts = defaultdict(int)
-        max_position = 0
-        
-        for chunk in self._read_fastq_chunks():
-            quality_line = chunk[3]  # Четвертая строка - качество
-            for i, char in enumerate(quality_line):
-                score = ord(char) - 33  # Конвертация в числовое качество
-                quality_sums[i] += score
-                quality_counts[i] += 1
-                max_position = max(max_position, i)
-        
-        positions = list(range(1, max_position + 2))
-        avg_qualities = [quality_sums[i] / quality_counts[i] for i in range(max_position + 1)]
-        
-        self._quality_data = (positions, avg_qualities)
+        if self._quality_data is None:
+            if self.skip_quality:
+                raise ValueError("Оценки качества не читаются в режиме skip_quality")
+            # Проход мог быть без качества (scan_lengths_and_bases_only)
+            self._collect_all()
         return self._quality_data
     
     def collect_length_data(self):
-        """Собирает данные для гистограммы длин"""
-        if self._length_data is not None:
-            return self._length_data
-            
-        lengths = []
-        
-        for chunk in self._read_fastq_chunks():
-            sequence_line = chunk[1]  # Вторая строка - последовательность
-            lengths.append(len(sequence_line))
-        
-        self._length_data = lengths
+        """Собирает данные для гистограммы длин: int32-массив длин ридов по порядку"""
+        self._ensure_collected()
         return self._length_data
     
     def collect_content_data(self):
         """Собирает данные для графика содержания нуклеотидов"""
-        if self._content_data is not None:
-            return self._content_data
-            
-        base_counts = {'A': defaultdict(int), 'C': defaultdict(int), 
-                      'G': defaultdict(int), 'T': defaultdict(int)}
-        total_counts = defaultdict(int)
-        max_position = 0
-        
-        for chunk in self._read_fastq_chunks():
-            sequence_line = chunk[1]  # Вторая строка - последовательность
-            for i, base in enumerate(sequence_line):
-                base_upper = base.upper()
-                if base_upper in base_counts:
-                    base_counts[base_upper][i] += 1
-                    total_counts[i] += 1
-                    max_position = max(max_position, i)
-        
-        positions = list(range(1, max_position + 2))
-        content_data = {}
-        for base in base_counts:
-            counts = base_counts[base]
-            percentages = [counts[i] / total_counts[i] * 100 if total_counts[i] > 0 else 0 
-                          for i in range(max_position + 1)]
-            content_data[base] = percentages
-        
-        self._content_data = (positions, content_data)
+        self._ensure_collected()
         return self._content_data
 
 
+def _new_figure(figsize):
+    """Новая Figure; matplotlib импортируется здесь, при первом графике, и сразу настраивается"""
+    import matplotlib
+    from matplotlib.figure import Figure
+    matplotlib.rcParams.update(PLOT_RC)
+    return Figure(figsize=figsize)
+
+
+def _plot_axes(fig, ax, figsize):
+    """
+    Ось для графика: заданная ax, новая ось в fig или в новой Figure размера figsize.
+    
+    Третье значение - вызов, завершающий раскладку: tight_layout для своей новой оси
+    и ничего для заданной (общую фигуру с несколькими осями раскладывает тот, кто её создал).
+    """
+    if ax is not None:
+        return ax.figure, ax, lambda: None
+    if fig is None:
+        # matplotlib импортируется при первом графике: окно и рабочие процессы его не ждут
+        fig = _new_figure(figsize)
+    return fig, fig.subplots(), fig.tight_layout
+
+
+def plot_per_base_quality(positions, avg_qualities, fig=None, ax=None):
+    """Рисует среднее качество по позициям в ax; без ax - в новой оси fig или новой Figure"""
+    fig, ax, layout = _plot_axes(fig, ax, (6, 4))
+    ax.plot(positions, avg_qualities, linewidth=2.5, color=PISTACHIO_THEME['primary_dark'], 
+            marker='o', markersize=2, alpha=0.8,
+            markevery=max(1, len(positions) // PLOT_MAX_MARKERS))
+    ax.fill_between(positions, avg_qualities, alpha=0.3, color=PISTACHIO_THEME['primary_light'])
+    ax.set_title('Per Base Sequence Quality', fontsize=11, fontweight='bold', 
+                 color=PISTACHIO_THEME['text_dark'], pad=10)
+    ax.set_xlabel('Position (bp)', fontsize=9, color=PISTACHIO_THEME['text_dark'])
+    ax.set_ylabel('Quality Score', fontsize=9, color=PISTACHIO_THEME['text_dark'])
+    ax.grid(True, alpha=0.3)
+    ax.set_facecolor(PISTACHIO_THEME['secondary'])
+    fig.patch.set_facecolor(PISTACHIO_THEME['secondary'])
+    layout()
+    return fig
+
+
+def plot_sequence_length_distribution(len_hist, fig=None, ax=None):
+    """Рисует гистограмму длин по счётчикам длин в ax; без ax - в новой оси fig или новой Figure"""
+    fig, ax, layout = _plot_axes(fig, ax, (6, 4))
+    lengths = np.flatnonzero(len_hist)
+    
+    ax.hist(lengths, bins=15, weights=len_hist[lengths], edgecolor=PISTACHIO_THEME['primary_dark'], 
+            alpha=0.7, color=PISTACHIO_THEME['primary'], linewidth=1.2)
+    ax.set_title('Sequence Length Distribution', fontsize=11, fontweight='bold', 
+                 color=PISTACHIO_THEME['text_dark'], pad=10)
+    ax.set_xlabel('Length (bp)', fontsize=9, color=PISTACHIO_THEME['text_dark'])
+    ax.set_ylabel('Frequency', fontsize=9, color=PISTACHIO_THEME['text_dark'])
+    ax.grid(True, alpha=0.3)
+    ax.set_facecolor(PISTACHIO_THEME['secondary'])
+    fig.patch.set_facecolor(PISTACHIO_THEME['secondary'])
+    layout()
+    return fig
+
+
+def plot_per_base_content(positions, content_data, fig=None, ax=None):
+    """Рисует содержание нуклеотидов по позициям в ax; без ax - в новой оси fig или новой Figure"""
+    fig, ax, layout = _plot_axes(fig, ax, (10, 5))
+    
+    colors = [PISTACHIO_THEME['primary'], '#FF6B6B', '#4ECDC4', '#FFD166']
+    
+    for base, color in zip(_BASES, colors):
+        percentages = content_data[base]
+        ax.plot(positions, percentages, label=base, linewidth=2, color=color, alpha=0.8)
+    
+    ax.set_title('Per Base Sequence Content', fontsize=12, fontweight='bold', 
+                color=PISTACHIO_THEME['text_dark'], pad=15)
+    ax.set_xlabel('Position in read (bp)', fontsize=10, color=PISTACHIO_THEME['text_dark'])
+    ax.set_ylabel('Percentage (%)', fontsize=10, color=PISTACHIO_THEME['text_dark'])
+    ax.legend(frameon=True, facecolor=PISTACHIO_THEME['secondary'], fontsize=9)
+    ax.grid(True, alpha=0.3)
+    ax.set_facecolor(PISTACHIO_THEME['secondary'])
+    fig.patch.set_facecolor(PISTACHIO_THEME['secondary'])
+    layout()
+    return fig
+
+
+def _figure_axes(fig, ncols):
+    """Оси fig для ncols графиков в ряд: подходящие очищаются, иначе создаются заново"""
+    axes = fig.get_axes()
+    if len(axes) == ncols:
+        for ax in axes:
+            ax.clear()
+        return axes
+    fig.clear()
+    return list(np.atleast_1d(fig.subplots(1, ncols)))
+
+
+def _quality_figure(scan, fig=None):
+    """Графики качества и распределения длин по результатам полного прохода - в fig или в новой Figure"""
+    if fig is None:
+        fig = _new_figure((16, 4))
+    quality_ax, length_ax = _figure_axes(fig, 2)
+    plot_per_base_quality(*_quality_from_hist(scan['qual_hist']), ax=quality_ax)
+    plot_sequence_length_distribution(scan['len_hist'], ax=length_ax)
+    fig.tight_layout()
+    return fig
+
+
 class FastqAnalyzerGUI:
     def __init__(self, root):
         self.root = root
@@ -145,10 +1031,63 @@ class FastqAnalyzerGUI:
         self.root.configure(bg=PISTACHIO_THEME['secondary'])
         
         self.current_file = None
-        self.analyzer = None
+        # Имя и размер файла запоминаются при загрузке, а не пересчитываются на каждый показ
+        self._file_basename = None
+        self._file_size = 0
+        self._stats_cache = None
+        # Проход без строк качества (см. _run_analysis): пока нет полного, им
+        # обслуживаются статистика и содержание нуклеотидов
+        self._partial_cache = None
+        self._progress_job = None
+        # Фигура и холст вкладки графиков создаются один раз и перерисовываются
+        self._plot_figure = None
+        self._plot_canvas = None
+        # Одновременно идёт не больше одного анализа; нажатия во время него
+        # запоминаются и выполняются по его результату без нового прохода
+        self._analysis_lock = threading.Lock()
+        self._pending = {}  # Как множество, но в порядке нажатий
+        
+        # Проход по файлу выполняется в отдельных процессах, вне GIL и потока Tk;
+        # spawn, чтобы не форкать процесс с запущенным Tk и потоками
+        self._closed = False
+        self._mp_context = multiprocessing.get_context('spawn')
+        self._scan_progress = self._mp_context.Value('q', 0)
+        self.pool = self._create_pool()
+        # Очередь фоновых заданий: результат прохода разбирается в одном потоке -
+        # не в потоке Tk (когда результат уже в кэше) и не в служебном потоке пула
+        self._executor = ThreadPoolExecutor(max_workers=1)
         
         self.setup_styles()
         self.setup_gui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def _create_pool(self):
+        """Start the scan process pool sharing the progress counter with its workers"""
+        pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) - 1),
+                                   mp_context=self._mp_context,
+                                   initializer=_init_worker,
+                                   initargs=(self._scan_progress,))
+        # spawn-пул запускает рабочих только под задачи: пустое задание поднимает
+        # одного сразу, и ядро прогревается до первого нажатия, а не во время него
+        pool.submit(_warmup_kernels)
+        return pool
+    
+    def _restart_pool(self, broken):
+        """Replace the broken process pool with a fresh one (once per broken pool)"""
+        if broken is self.pool:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._create_pool()
+    
+    def on_close(self):
+        """Stop background scans and close the window"""
+        self._closed = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        # shutdown не прерывает уже идущий проход: без этого процесс приложения
+        # ждал бы при выходе, пока рабочий дочитает многогигабайтный файл
+        for process in multiprocessing.active_children():
+            process.terminate()
+        self.root.destroy()
         
     def setup_styles(self):
         """Настраиваем стили для виджетов"""
@@ -263,7 +1202,7 @@ class FastqAnalyzerGUI:
                   command=self.full_analysis, style='Pistachio.TButton').pack(side=tk.LEFT)
         
         # Progress bar
-        self.progress = ttk.Progressbar(control_content, mode='indeterminate', 
+        self.progress = ttk.Progressbar(control_content, mode='determinate', 
                                        style='Pistachio.Horizontal.TProgressbar')
         self.progress.pack(fill=tk.X, pady=(10, 0))
         
@@ -320,7 +1259,7 @@ class FastqAnalyzerGUI:
             title="Select FASTQ File",
             filetypes=[
                 ("FASTQ files", "*.fastq *.fq"),
-                ("Compressed FASTQ", "*.fastq.gz *.fq.gz"),
+                ("Compressed FASTQ", "*.fastq.gz *.fq.gz *.fastq.zst *.fq.zst"),
                 ("All files", "*.*")
             ]
         )
@@ -331,53 +1270,151 @@ class FastqAnalyzerGUI:
     def load_file(self, filename):
         """Load and validate FASTQ file"""
         self.current_file = filename
-        self.file_label.config(text=f" {os.path.basename(filename)}")
-        self.status_var.set(f" Loaded: {os.path.basename(filename)}")
+        self._file_basename = os.path.basename(filename)
+        try:
+            self._file_size = os.path.getsize(filename)
+        except OSError:  # Файл пропал - об ошибке сообщит сам анализ
+            self._file_size = 0
+        self.file_label.config(text=f" {self._file_basename}")
+        self.status_var.set(f" Loaded: {self._file_basename}")
         
         # Clear previous results
         self.stats_text.delete(1.0, tk.END)
         self.clear_plots()
-        self.analyzer = None
+        # Свежий индекс от прошлого запуска избавляет от повторного разбора
+        self._stats_cache = _load_index(filename)
+        self._partial_cache = None
     
     def clear_plots(self):
-        """Clear all plots from plots frame"""
-        for widget in self.plots_frame.winfo_children():
-            widget.destroy()
+        """Clear the plots tab, keeping its figure and canvas for reuse"""
+        if self._plot_canvas is not None:
+            self._plot_figure.clear()
+            self._plot_canvas.draw_idle()
     
-    def show_statistics(self):
-        """Display basic statistics"""
-        if not self.current_file:
-            messagebox.showerror("Error", "Please select a FASTQ file first")
+    def _plot_area(self):
+        """Return the plots tab figure and canvas, creating them on first use"""
+        if self._plot_canvas is None:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self._plot_figure = _new_figure((16, 4))
+            self._plot_canvas = FigureCanvasTkAgg(self._plot_figure, self.plots_frame)
+            self._plot_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        return self._plot_figure, self._plot_canvas
+    
+    def _run_analysis(self, name, analyze, error_prefix, skip_quality=False):
+        """
+        Call analyze(cache) with the full scan of the current file.
+        The scan runs in the process pool unless it is already cached;
+        its result is checked and cached on the Tk thread, and analyze
+        itself always runs on the single background job thread.
+        With skip_quality analyze does not need quality data: it is served by
+        either cached scan, and when none exists the scan ignores quality lines;
+        that partial scan is kept for later skip_quality analyses until a full
+        scan replaces it.
+        A result for a file that was replaced in the meantime is dropped.
+        While another analysis is running, the button method `name` is
+        queued and re-run once that analysis finishes.
+        """
+        if not self._analysis_lock.acquire(blocking=False):
+            self._pending[name] = None
             return
         
         self.start_processing()
+        path = self.current_file
+        pool = self.pool
         
-        def analyze():
+        def finish(future):
+            # Выполняется в потоке Tk: проверка текущего файла и запись в кэш
+            # не пересекаются с load_file, который меняет их там же
             try:
-                self.analyzer = FastqReader(self.current_file)
-                count = self.analyzer.get_sequence_count()
-                avg_len = self.analyzer.get_average_length()
-                total_bp = count * avg_len
-                
-                # Update GUI in main thread
-                self.root.after(0, lambda: self.display_statistics(count, avg_len, total_bp))
-                
+                cache = future.result()
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Analysis failed: {str(e)}"))
+                if isinstance(e, BrokenProcessPool):
+                    # Рабочий процесс умер посреди прохода (нехватка памяти и т.п.)
+                    self._restart_pool(pool)
+                messagebox.showerror("Error", f"{error_prefix}: {str(e)}")
+                self._finish_analysis()
+                return
+            # Пока шёл проход, загрузили другой файл: результат прежнего
+            # не сохраняем и не показываем под именем и размером нового
+            if path != self.current_file:
+                self._finish_analysis()
+                return
+            if not skip_quality:
+                # Полный проход заменяет частичный: дальше все берут его
+                self._stats_cache = cache
+                self._partial_cache = None
+            elif self._stats_cache is None:
+                # Проход без качества годится для содержания нуклеотидов
+                self._partial_cache = cache
+            self._executor.submit(report, cache)
+        
+        def report(cache):
+            try:
+                analyze(cache)
+            except Exception as e:
+                message = f"{error_prefix}: {str(e)}"
+                self.root.after(0, lambda: messagebox.showerror("Error", message))
             finally:
-                self.root.after(0, self.stop_processing)
+                self.root.after(0, self._finish_analysis)
+        
+        cache = self._stats_cache
+        if cache is None and skip_quality:
+            cache = self._partial_cache
+        try:
+            if cache is not None:
+                future = Future()
+                future.set_result(cache)
+            elif skip_quality:
+                future = pool.submit(_full_scan, path, True)
+            else:
+                future = pool.submit(_indexed_scan, path)
+        except BrokenProcessPool as e:
+            # Пул сломан раньше (умер рабочий): новые задачи он уже не примет
+            self._restart_pool(pool)
+            self._finish_analysis()
+            messagebox.showerror("Error", f"{error_prefix}: {str(e)}. Please try again.")
+            return
+        except Exception:
+            self._finish_analysis()
+            raise
+        
+        def dispatch(done):
+            # После закрытия окна результаты (и ошибки прерванных проходов) не нужны
+            if not self._closed:
+                self.root.after(0, lambda: finish(done))
         
-        # Run analysis in separate thread
-        thread = threading.Thread(target=analyze)
-        thread.daemon = True
-        thread.start()
+        future.add_done_callback(dispatch)
     
-    def display_statistics(self, count, avg_len, total_bp):
+    def _finish_analysis(self):
+        """Release the analysis lock and run the analyses queued meanwhile in click order"""
+        self.stop_processing()
+        self._analysis_lock.release()
+        pending, self._pending = self._pending, {}
+        for name in pending:
+            getattr(self, name)()
+    
+    def show_statistics(self):
+        """Display basic statistics"""
+        if not self.current_file:
+            messagebox.showerror("Error", "Please select a FASTQ file first")
+            return
+        
+        def analyze(cache):
+            count, total_bp = cache['count'], cache['total_length']
+            
+            # Update GUI in main thread
+            self.root.after(0, lambda: self.display_statistics(count, total_bp))
+        
+        # Run analysis in the process pool
+        self._run_analysis('show_statistics', analyze, "Analysis failed")
+    
+    def display_statistics(self, count, total_bp):
         """Display statistics in the text widget"""
+        avg_len = total_bp / count if count else 0
         stats_text = f"""🧬 FASTQ FILE STATISTICS
 {'=' * 50}
 
- File: {os.path.basename(self.current_file)}
+ File: {self._file_basename}
 
  Basic Statistics:
 • Sequence count: {count:,}
@@ -385,7 +1422,7 @@ class FastqAnalyzerGUI:
 • Total data volume: {total_bp:,.0f} bp
 
  File Information:
-• File size: {os.path.getsize(self.current_file) / 1024 / 1024:.2f} MB
+• File size: {self._file_size / 1024 / 1024:.2f} MB
 • Memory usage: Optimized (generators)
 
  Analysis completed successfully."""
@@ -400,79 +1437,19 @@ class FastqAnalyzerGUI:
             messagebox.showerror("Error", "Please select a FASTQ file first")
             return
         
-        self.start_processing()
-        
-        def analyze():
-            try:
-                if not self.analyzer:
-                    self.analyzer = FastqReader(self.current_file)
-                
-                # Собираем данные для графиков
-                self.analyzer.collect_quality_data()
-                self.analyzer.collect_length_data()
-                
-                # Update GUI in main thread
-                self.root.after(0, self.display_quality_plots)
-                
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Quality analysis failed: {str(e)}"))
-            finally:
-                self.root.after(0, self.stop_processing)
+        def analyze(cache):
+            # Update GUI in main thread
+            self.root.after(0, lambda: self.display_quality_plots(cache))
         
-        thread = threading.Thread(target=analyze)
-        thread.daemon = True
-        thread.start()
+        self._run_analysis('quality_analysis', analyze, "Quality analysis failed")
     
-    def display_quality_plots(self):
+    def display_quality_plots(self, scan):
         """Display quality plots in the GUI"""
-        self.clear_plots()
-        
-        if not self.analyzer:
-            return
-        
-        # Create frame for plots
-        plots_container = tk.Frame(self.plots_frame, bg=PISTACHIO_THEME['secondary'])
-        plots_container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
         try:
-            # График 1: Качество по позициям
-            positions, avg_qualities = self.analyzer.collect_quality_data()
-            
-            fig1, ax1 = plt.subplots(figsize=(6, 4))
-            ax1.plot(positions, avg_qualities, linewidth=2.5, color=PISTACHIO_THEME['primary_dark'], 
-                    marker='o', markersize=2, alpha=0.8)
-            ax1.fill_between(positions, avg_qualities, alpha=0.3, color=PISTACHIO_THEME['primary_light'])
-            ax1.set_title('Per Base Sequence Quality', fontsize=11, fontweight='bold', 
-                         color=PISTACHIO_THEME['text_dark'], pad=10)
-            ax1.set_xlabel('Position (bp)', fontsize=9, color=PISTACHIO_THEME['text_dark'])
-            ax1.set_ylabel('Quality Score', fontsize=9, color=PISTACHIO_THEME['text_dark'])
-            ax1.grid(True, alpha=0.3)
-            ax1.set_facecolor(PISTACHIO_THEME['secondary'])
-            fig1.patch.set_facecolor(PISTACHIO_THEME['secondary'])
-            fig1.tight_layout()
-            
-            canvas1 = FigureCanvasTkAgg(fig1, plots_container)
-            canvas1.draw()
-            canvas1.get_tk_widget().pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
-            
-            # График 2: Распределение длин
-            lengths = self.analyzer.collect_length_data()
-            
-            fig2, ax2 = plt.subplots(figsize=(6, 4))
-            ax2.hist(lengths, bins=15, edgecolor=PISTACHIO_THEME['primary_dark'], 
-                    alpha=0.7, color=PISTACHIO_THEME['primary'], linewidth=1.2)
-            ax2.set_title('Sequence Length Distribution', fontsize=11, fontweight='bold', 
-                         color=PISTACHIO_THEME['text_dark'], pad=10)
-            ax2.set_xlabel('Length (bp)', fontsize=9, color=PISTACHIO_THEME['text_dark'])
-            ax2.set_ylabel('Frequency', fontsize=9, color=PISTACHIO_THEME['text_dark'])
-            ax2.grid(True, alpha=0.3)
-            ax2.set_facecolor(PISTACHIO_THEME['secondary'])
-            fig2.patch.set_facecolor(PISTACHIO_THEME['secondary'])
-            fig2.tight_layout()
-            
-            canvas2 = FigureCanvasTkAgg(fig2, plots_container)
-            canvas2.draw()
-            canvas2.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+            fig, canvas = self._plot_area()
+            # Оси прежней фигуры очищаются и рисуются заново: без новых Figure и холста
+            _quality_figure(scan, fig)
+            canvas.draw_idle()
             
             # Switch to plots tab
             self.notebook.select(1)
@@ -486,61 +1463,21 @@ class FastqAnalyzerGUI:
             messagebox.showerror("Error", "Please select a FASTQ file first")
             return
         
-        self.start_processing()
-        
-        def analyze():
-            try:
-                if not self.analyzer:
-                    self.analyzer = FastqReader(self.current_file)
-                
-                # Собираем данные для графика содержания
-                self.analyzer.collect_content_data()
-                
-                self.root.after(0, self.display_nucleotide_plot)
-                
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Content analysis failed: {str(e)}"))
-            finally:
-                self.root.after(0, self.stop_processing)
+        def analyze(cache):
+            content = _content_from_hist(cache['base_hist'])
+            
+            self.root.after(0, lambda: self.display_nucleotide_plot(content))
         
-        thread = threading.Thread(target=analyze)
-        thread.daemon = True
-        thread.start()
+        self._run_analysis('nucleotide_analysis', analyze, "Content analysis failed", skip_quality=True)
     
-    def display_nucleotide_plot(self):
+    def display_nucleotide_plot(self, content):
         """Display nucleotide content plot"""
-        self.clear_plots()
-        
-        if not self.analyzer:
-            return
-        
         try:
-            # Собираем данные для графика содержания
-            positions, content_data = self.analyzer.collect_content_data()
-            
-            # Создаём график
-            fig, ax = plt.subplots(figsize=(10, 5))
-            
-            colors = [PISTACHIO_THEME['primary'], '#FF6B6B', '#4ECDC4', '#FFD166']
-            bases = ['A', 'C', 'G', 'T']
-            
-            for base, color in zip(bases, colors):
-                percentages = content_data[base]
-                ax.plot(positions, percentages, label=base, linewidth=2, color=color, alpha=0.8)
-            
-            ax.set_title('Per Base Sequence Content', fontsize=12, fontweight='bold', 
-                        color=PISTACHIO_THEME['text_dark'], pad=15)
-            ax.set_xlabel('Position in read (bp)', fontsize=10, color=PISTACHIO_THEME['text_dark'])
-            ax.set_ylabel('Percentage (%)', fontsize=10, color=PISTACHIO_THEME['text_dark'])
-            ax.legend(frameon=True, facecolor=PISTACHIO_THEME['secondary'], fontsize=9)
-            ax.grid(True, alpha=0.3)
-            ax.set_facecolor(PISTACHIO_THEME['secondary'])
-            fig.patch.set_facecolor(PISTACHIO_THEME['secondary'])
+            fig, canvas = self._plot_area()
+            ax, = _figure_axes(fig, 1)
+            plot_per_base_content(*content, ax=ax)
             fig.tight_layout()
-            
-            canvas = FigureCanvasTkAgg(fig, self.plots_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            canvas.draw_idle()
             
             self.notebook.select(1)
             
@@ -553,41 +1490,22 @@ class FastqAnalyzerGUI:
             messagebox.showerror("Error", "Please select a FASTQ file first")
             return
         
-        self.start_processing()
-        
-        def analyze():
-            try:
-                self.analyzer = FastqReader(self.current_file)
-                
-                # Get statistics
-                count = self.analyzer.get_sequence_count()
-                avg_len = self.analyzer.get_average_length()
-                total_bp = count * avg_len
-                
-                # Собираем данные для всех графиков
-                self.analyzer.collect_quality_data()
-                self.analyzer.collect_length_data()
-                self.analyzer.collect_content_data()
-                
-                # Update GUI
-                self.root.after(0, lambda: self.display_full_analysis(count, avg_len, total_bp))
-                
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Full analysis failed: {str(e)}"))
-            finally:
-                self.root.after(0, self.stop_processing)
+        def analyze(cache):
+            # Один проход собирает данные для статистики и всех графиков
+            count, total_bp = cache['count'], cache['total_length']
+            
+            # Update GUI
+            self.root.after(0, lambda: self.display_full_analysis(count, total_bp, cache))
         
-        thread = threading.Thread(target=analyze)
-        thread.daemon = True
-        thread.start()
+        self._run_analysis('full_analysis', analyze, "Full analysis failed")
     
-    def display_full_analysis(self, count, avg_len, total_bp):
+    def display_full_analysis(self, count, total_bp, scan):
         """Display results of full analysis"""
         # Show statistics
-        self.display_statistics(count, avg_len, total_bp)
+        self.display_statistics(count, total_bp)
         
         # Show all plots
-        self.display_quality_plots()
+        self.display_quality_plots(scan)
         
         messagebox.showinfo("Analysis Complete", 
                           " Full analysis completed successfully!\n\n"
@@ -595,12 +1513,25 @@ class FastqAnalyzerGUI:
     
     def start_processing(self):
         """Start progress indicator"""
-        self.progress.start()
+        # Для сжатого файла прогресс идёт по нему самому, поэтому максимум - размер на диске
+        self._scan_progress.value = 0
+        self.progress.configure(maximum=max(self._file_size, 1), value=0)
         self.status_var.set(" Processing... Please wait")
+        if self._progress_job is not None:
+            self.root.after_cancel(self._progress_job)
+        self._poll_progress()
+    
+    def _poll_progress(self):
+        """Refresh the progress bar from the shared byte counter every 100 ms"""
+        self.progress['value'] = self._scan_progress.value
+        self._progress_job = self.root.after(100, self._poll_progress)
     
     def stop_processing(self):
         """Stop progress indicator"""
-        self.progress.stop()
+        if self._progress_job is not None:
+            self.root.after_cancel(self._progress_job)
+            self._progress_job = None
+        self.progress['value'] = self.progress['maximum']
         self.status_var.set(" Analysis complete")
 
 def main():